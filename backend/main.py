@@ -1,25 +1,39 @@
+import io
 import os
 import re
 import json
 import math
+import heapq
 import shutil
 import logging
 import asyncio
 import hashlib
+import zipfile
 import tempfile
 import subprocess
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from openai import OpenAI
+
+try:
+    from sse_starlette.sse import EventSourceResponse
+except ImportError:  # keep working on minimal installs
+    EventSourceResponse = None
+import httpx
+import orjson
+from pydantic import BaseModel, Field, TypeAdapter, field_serializer
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+import scan_cache
+
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 logger = logging.getLogger("MambaGraph")
@@ -27,16 +41,18 @@ logger = logging.getLogger("MambaGraph")
 ENV_FILE = Path(__file__).parent / ".env"
 CLONE_DIR = Path(tempfile.gettempdir()) / "mamba-graph-clones"
 CLONE_DIR.mkdir(exist_ok=True)
+ANALYSIS_CACHE = CLONE_DIR / ".analysis_cache.json"
+SCAN_SCHEMA_VERSION = 2  # dependency_links gained source_idx/target_idx
 
 NVIDIA_MODEL = "nvidia/nvidia-nemotron-nano-9b-v2"
 NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
 
-IGNORE_PATHS = {
+IGNORE_PATHS = frozenset({
     "node_modules", ".git", "__pycache__", "venv", ".venv", "env",
     "dist", "build", ".next", "target", "vendor", "coverage",
     ".vscode", ".idea", "bin", "obj", "logs", "tmp", ".cache",
     ".tox", ".mypy_cache", ".pytest_cache", "egg-info",
-}
+})
 
 LANGUAGE_MAP = {
     # Code
@@ -106,7 +122,7 @@ LANGUAGE_MAP = {
     ".prisma": {"name": "Prisma", "color": "#2D3748"},
 }
 
-SUPPORTED_EXTENSIONS = set(LANGUAGE_MAP.keys())
+SUPPORTED_EXTENSIONS = frozenset(LANGUAGE_MAP.keys())
 
 # Files without extensions that we should still include
 SPECIAL_FILENAMES = {
@@ -133,21 +149,35 @@ SPECIAL_FILENAMES = {
     ".env.example": {"name": "Env Example", "color": "#ECD53F"},
 }
 
+# Hoisted out of the scan loop — it was rebuilt per file
+SPECIAL_FILENAMES_LOWER = frozenset(k.lower() for k in SPECIAL_FILENAMES)
+
 IMPORT_PATTERNS = {
     ".py": [r"^import\s+([\w.]+)", r"^from\s+([\w.]+)\s+import"],
-    ".js": [r"""(?:import\s+.*?from\s+['"])([\w@/.~-]+)['"]""", r"""(?:require\s*\(\s*['"])([\w@/.~-]+)['"]\s*\))"""],
-    ".ts": [r"""(?:import\s+.*?from\s+['"])([\w@/.~-]+)['"]""", r"""(?:require\s*\(\s*['"])([\w@/.~-]+)['"]\s*\))"""],
-    ".jsx": [r"""(?:import\s+.*?from\s+['"])([\w@/.~-]+)['"]""", r"""(?:require\s*\(\s*['"])([\w@/.~-]+)['"]\s*\))"""],
-    ".tsx": [r"""(?:import\s+.*?from\s+['"])([\w@/.~-]+)['"]""", r"""(?:require\s*\(\s*['"])([\w@/.~-]+)['"]\s*\))"""],
     ".go": [r"""["']([\w./]+)["']"""],
     ".rs": [r"^use\s+([\w:]+)"],
     ".java": [r"^import\s+([\w.]+)"],
-    ".c": [r'#include\s*[<"]([\w/.]+)[>"]'],
-    ".cpp": [r'#include\s*[<"]([\w/.]+)[>"]'],
-    ".h": [r'#include\s*[<"]([\w/.]+)[>"]'],
-    ".cu": [r'#include\s*[<"]([\w/.]+)[>"]'],
 }
 
+# import-from and require() in one alternation, so JS-family files get a
+# single linear scan instead of two passes over the same content
+JS_IMPORT_RE = re.compile(
+    r"""(?:import\s+.*?from\s+['"]([\w@/.~-]+)['"])|(?:require\s*\(\s*['"]([\w@/.~-]+)['"]\s*\))""",
+    re.MULTILINE,
+)
+C_INCLUDE_RE = re.compile(r'#include\s*[<"]([\w/.]+)[>"]', re.MULTILINE)
+
+# Compiled once at import — scanning 120 files can mean 200+ regex calls,
+# and compiled.findall skips the re-cache lookup on every one of them.
+IMPORT_PATTERNS_COMPILED = {
+    ext: [re.compile(p, re.MULTILINE) for p in patterns]
+    for ext, patterns in IMPORT_PATTERNS.items()
+}
+IMPORT_PATTERNS_COMPILED.update({
+    ".js": [JS_IMPORT_RE], ".ts": [JS_IMPORT_RE], ".jsx": [JS_IMPORT_RE], ".tsx": [JS_IMPORT_RE],
+    ".c": [C_INCLUDE_RE], ".cpp": [C_INCLUDE_RE], ".h": [C_INCLUDE_RE], ".cu": [C_INCLUDE_RE],
+})
+
 GITHUB_PATTERNS = [
     r"^https?://github\.com/([\w.-]+)/([\w.-]+?)(?:\.git)?(?:/.*)?$",
     r"^git@github\.com:([\w.-]+)/([\w.-]+?)(?:\.git)?$",
@@ -155,6 +185,10 @@ GITHUB_PATTERNS = [
     r"^https?://bitbucket\.org/([\w.-]+)/([\w.-]+?)(?:\.git)?(?:/.*)?$",
 ]
 
+GITHUB_PATTERNS_COMPILED = [re.compile(p) for p in GITHUB_PATTERNS]
+
+RELATIVE_PREFIX_RE = re.compile(r"^\.\.?/")
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # DATA MODELS
@@ -184,11 +218,22 @@ class FileNodeInfo(BaseModel):
     extension: str
     language: str
     language_color: str
-    last_modified: str
+    last_modified: float  # raw st_mtime; serialized as ISO-8601
     imports: List[str] = []
     complexity_score: float = 0.0
     has_tests: bool = False
 
+    @field_serializer("last_modified")
+    def _iso_mtime(self, v: float) -> str:
+        # Formatting deferred to dump time — endpoints that never return
+        # metadata skip the per-file datetime allocation entirely
+        return datetime.fromtimestamp(v).isoformat()
+
+
+# One compiled serializer for whole file lists — dumping through it is a
+# single Rust-side pass instead of a Python .dict() call per file
+FILE_LIST_ADAPTER = TypeAdapter(List[FileNodeInfo])
+
 
 class APIKeyManager:
     @staticmethod
@@ -202,18 +247,28 @@ class APIKeyManager:
 
     @staticmethod
     def save_key(key: str):
-        ENV_FILE.touch(exist_ok=True)
-        content = ENV_FILE.read_text() if ENV_FILE.exists() else ""
-        if "NVIDIA_API_KEY=" in content:
-            content = re.sub(r"NVIDIA_API_KEY=.*", f"NVIDIA_API_KEY={key}", content)
-        else:
-            content += f"\nNVIDIA_API_KEY={key}\n"
-        ENV_FILE.write_text(content.strip() + "\n")
+        # Drop any existing NVIDIA_API_KEY lines (the old regex rewrite only
+        # handled one), append the new one, and swap in atomically so a crash
+        # mid-write can't corrupt the .env file.
+        lines = []
+        if ENV_FILE.exists():
+            lines = [l for l in ENV_FILE.read_text().splitlines() if not l.startswith("NVIDIA_API_KEY=")]
+        lines.append(f"NVIDIA_API_KEY={key}")
+        tmp = ENV_FILE.with_name(".env.tmp")
+        tmp.write_text("\n".join(lines).strip() + "\n")
+        os.replace(tmp, ENV_FILE)
         os.environ["NVIDIA_API_KEY"] = key
+        APIKeyManager._has_key = bool(key.strip())
 
-    @staticmethod
-    def has_key() -> bool:
-        return bool(os.getenv("NVIDIA_API_KEY", "").strip())
+    # Cached so the health endpoint doesn't re-check the environment on
+    # every poll; save_key is the only writer, so it owns invalidation.
+    _has_key: Optional[bool] = None
+
+    @classmethod
+    def has_key(cls) -> bool:
+        if cls._has_key is None:
+            cls._has_key = bool(os.getenv("NVIDIA_API_KEY", "").strip())
+        return cls._has_key
 
 
 
@@ -223,14 +278,59 @@ class RepoResolver:
         path = path.strip()
         return path.startswith("https://") or path.startswith("git@") or path.startswith("http://")
 
+    @staticmethod
+    def _download_archive(owner: str, repo: str, dest: Path) -> bool:
+        """Download GitHub's ZIP archive for HEAD and extract it into dest.
+
+        Faster than a shallow clone — no pack negotiation, no .git metadata,
+        the server streams a pre-built ZIP — and needs no git binary.
+        Returns False so the caller can fall back to git clone.
+        """
+        archive_url = f"https://codeload.github.com/{owner}/{repo}/zip/HEAD"
+        tmp_zip = None
+        try:
+            with httpx.Client(follow_redirects=True, timeout=120) as client:
+                with client.stream("GET", archive_url) as resp:
+                    if resp.status_code != 200:
+                        return False
+                    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+                        tmp_zip = tmp.name
+                        for chunk in resp.iter_bytes():
+                            tmp.write(chunk)
+            with zipfile.ZipFile(tmp_zip) as zf:
+                # Zip Slip guard: refuse absolute paths or .. components
+                for name in zf.namelist():
+                    p = Path(name)
+                    if p.is_absolute() or ".." in p.parts:
+                        logger.warning(f"Rejecting archive with unsafe entry: {name}")
+                        return False
+                with tempfile.TemporaryDirectory(dir=CLONE_DIR) as extract_dir:
+                    zf.extractall(extract_dir)
+                    # GitHub wraps everything in a single {repo}-{sha}/ dir
+                    roots = list(os.scandir(extract_dir))
+                    if len(roots) == 1 and roots[0].is_dir():
+                        shutil.move(roots[0].path, dest)
+                    else:
+                        dest.mkdir(exist_ok=True)
+                        for e in roots:
+                            shutil.move(e.path, dest / e.name)
+            return True
+        except (httpx.HTTPError, zipfile.BadZipFile, OSError) as e:
+            logger.warning(f"Archive download failed, falling back to git clone: {e}")
+            return False
+        finally:
+            if tmp_zip and os.path.exists(tmp_zip):
+                os.unlink(tmp_zip)
+
     @staticmethod
     def clone_repo(url: str) -> Tuple[str, str]:
         """Clone repo, return (local_path, repo_name)."""
         url = url.strip().rstrip("/")
+        owner = None
         repo_name = "repo"
 
-        for pattern in GITHUB_PATTERNS:
-            match = re.match(pattern, url)
+        for pattern in GITHUB_PATTERNS_COMPILED:
+            match = pattern.match(url)
             if match:
                 owner, repo_name = match.group(1), match.group(2)
                 if "github.com" in url:
@@ -249,12 +349,26 @@ class RepoResolver:
 
         if clone_path.exists():
             logger.info(f"Using cached clone: {clone_path}")
-            try:
-                subprocess.run(["git", "-C", str(clone_path), "pull", "--ff-only"], capture_output=True, timeout=60)
-            except Exception:
-                pass
+            # Archive-extracted clones have no .git; only git clones update.
+            # Shallow fetch + hard reset transfers less than pull and can't
+            # fail on diverged history; GIT_TERMINAL_PROMPT=0 stops git
+            # hanging on credential prompts for repos gone private.
+            if (clone_path / ".git").exists():
+                try:
+                    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+                    subprocess.run(["git", "-C", str(clone_path), "fetch", "--depth", "1", "origin", "HEAD"],
+                                   capture_output=True, timeout=60, env=env)
+                    subprocess.run(["git", "-C", str(clone_path), "reset", "--hard", "FETCH_HEAD"],
+                                   capture_output=True, timeout=30, env=env)
+                except Exception:
+                    pass
             return str(clone_path), repo_name
 
+        if owner and "github.com" in url:
+            logger.info(f"Downloading archive for {owner}/{repo_name}")
+            if RepoResolver._download_archive(owner, repo_name, clone_path):
+                return str(clone_path), repo_name
+
         logger.info(f"Cloning {url}")
         try:
             result = subprocess.run(
@@ -270,7 +384,12 @@ class RepoResolver:
 
         return str(clone_path), repo_name
 
+    # Memoized: every endpoint resolves the same directory string, and for
+    # URLs that means a stat + cached-clone freshness check per request.
+    # DELETE /api/v1/cache clears this cache along with the clones, which
+    # is also how a stale clone gets re-fetched.
     @staticmethod
+    @lru_cache(maxsize=256)
     def resolve(path: str) -> str:
         path = path.strip()
         if RepoResolver.is_url(path):
@@ -298,15 +417,25 @@ class ComplexityAnalyzer:
         ".cpp": ["if ", "else ", "for ", "while ", "switch ", "case ", "catch "],
     }
 
+    # One alternation regex per extension, built once: a single C-level scan
+    # of the whole content replaces the per-line × per-keyword substring loop.
+    BRANCH_RE = {
+        ext: re.compile(r"(?m)^\s*(?:" + "|".join(re.escape(k.strip().rstrip(":")) for k in kws) + r")\b")
+        for ext, kws in BRANCH_KW.items()
+    }
+    DEFAULT_BRANCH_RE = re.compile(r"(?m)^\s*(?:if|for|while)\b")
+    # Leading whitespace of non-blank lines; one C-level scan instead of a
+    # Python loop allocating an lstrip copy per line
+    INDENT_RE = re.compile(r"(?m)^[ \t]+(?=\S)")
+
     @staticmethod
     def score(content: str, ext: str) -> float:
-        lines = content.split("\n")
-        total = len(lines)
-        if total == 0:
+        if not content:
             return 0.0
-        keywords = ComplexityAnalyzer.BRANCH_KW.get(ext, ["if ", "for ", "while "])
-        branch_count = sum(1 for l in lines if any(kw in l for kw in keywords))
-        max_indent = max((len(l) - len(l.lstrip()) for l in lines if l.strip()), default=0)
+        total = content.count("\n") + 1
+        pat = ComplexityAnalyzer.BRANCH_RE.get(ext, ComplexityAnalyzer.DEFAULT_BRANCH_RE)
+        branch_count = len(pat.findall(content))
+        max_indent = max((m.end() - m.start() for m in ComplexityAnalyzer.INDENT_RE.finditer(content)), default=0)
         nesting = min(max_indent / 4.0, 10) / 10.0
         density = min(branch_count / max(total, 1), 1.0)
         length = min(math.log10(max(total, 1)) / 4.0, 1.0)
@@ -314,151 +443,324 @@ class ComplexityAnalyzer:
 
 
 
+def _extract_imports(content: str, ext: str) -> List[str]:
+    imports = set()
+    for pat in IMPORT_PATTERNS_COMPILED.get(ext, ()):
+        if pat.groups > 1:
+            # combined alternation: exactly one group matches per hit
+            imports.update(m.group(1) or m.group(2) for m in pat.finditer(content))
+        else:
+            imports.update(pat.findall(content))
+    return list(imports)
+
+
+def _read_and_analyze(path: str, ext: str, need_analysis: bool):
+    """Read one file and (when uncached) run import extraction + scoring.
+
+    Module-level so it can run in a ProcessPoolExecutor worker on large
+    scans. Exceptions are returned rather than raised so one unreadable
+    file doesn't abort a whole pool.map batch.
+    """
+    try:
+        # One sized read() + one bulk decode beats text mode's incremental
+        # decoding, and the context manager closes the fd on error paths
+        with open(path, "rb") as f:
+            raw = f.read()
+        content = raw.decode("utf-8", "ignore")
+        if "\r" in content:
+            # text mode used to do universal-newline translation
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        # C-level byte scan; splitting into a line list is deferred to the
+        # one branch that actually slices lines
+        n_lines = content.count("\n") + (0 if content.endswith("\n") else 1)
+        imports: List[str] = []
+        cx = 0.0
+        if need_analysis:
+            imports = _extract_imports(content, ext)
+            cx = ComplexityAnalyzer.score(content, ext)
+        return content, n_lines, imports, cx
+    except Exception as e:
+        return e
+
+
 class RepositoryProcessor:
+    READ_CONCURRENCY = 16
+    # Below this many files the IPC cost of a process pool exceeds the win
+    PROCESS_POOL_MIN_FILES = 16
+
     def __init__(self, root: str, max_files=120, include_tests=False, depth=6):
         self.root = root
         self.max_files = max_files
         self.include_tests = include_tests
         self.depth = depth
+        self._analysis_cache = self._load_analysis_cache()
+        self._cache_dirty = False
 
-    def _extract_imports(self, content: str, ext: str) -> List[str]:
-        patterns = IMPORT_PATTERNS.get(ext, [])
-        imports = []
-        for p in patterns:
-            imports.extend(re.findall(p, content, re.MULTILINE))
-        return list(set(imports))
-
-    def _resolve_import(self, imp: str, all_files: Dict) -> Optional[str]:
-        candidates = [
-            imp.replace(".", os.sep), imp.replace(".", os.sep) + ".py",
-            imp.replace("/", os.sep), imp.replace("/", os.sep) + ".js",
-            imp.replace("/", os.sep) + ".ts", imp.replace("/", os.sep) + ".tsx",
-            imp.replace("/", os.sep) + ".jsx",
-            re.sub(r"^\.\.?/", "", imp),
-        ]
-        for c in candidates:
-            for f in all_files:
-                if f.endswith(c) or c in f:
-                    return f
+    @staticmethod
+    def _load_analysis_cache() -> Dict:
+        """Per-file imports/complexity cache, keyed by abs path + mtime + size.
+
+        Re-analyzing the same clone (different max_files/depth) skips the
+        regex and scoring work for every unchanged file.
+        """
+        try:
+            return json.loads(ANALYSIS_CACHE.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _flush_analysis_cache(self):
+        if not self._cache_dirty:
+            return
+        try:
+            ANALYSIS_CACHE.write_text(json.dumps(self._analysis_cache))
+            self._cache_dirty = False
+        except OSError as e:
+            logger.warning(f"Could not write analysis cache: {e}")
+
+    @staticmethod
+    def _build_suffix_index(rel_paths) -> Dict[str, str]:
+        """Map every path suffix, with and without extension, to its file.
+
+        'a/b/c.py' indexes 'a/b/c.py', 'b/c.py', 'c.py', 'a/b/c', 'b/c'
+        and 'c', so resolving an import is a couple of dict lookups instead
+        of an O(candidates × files) endswith scan per import.
+        """
+        index: Dict[str, str] = {}
+        for rel in rel_paths:
+            parts = rel.split(os.sep)
+            for i in range(len(parts)):
+                suffix = os.sep.join(parts[i:])
+                index.setdefault(suffix, rel)
+                base, ext = os.path.splitext(suffix)
+                if ext:
+                    index.setdefault(base, rel)
+        return index
+
+    def _resolve_import(self, imp: str, suffix_index: Dict[str, str]) -> Optional[str]:
+        imp = RELATIVE_PREFIX_RE.sub("", imp)
+        for c in (imp.replace(".", os.sep), imp.replace("/", os.sep), imp):
+            hit = suffix_index.get(c)
+            if hit:
+                return hit
         return None
 
-    def generate_tree(self) -> str:
-        lines = []
-        for root, dirs, files in os.walk(self.root):
-            dirs[:] = sorted([d for d in dirs if d not in IGNORE_PATHS])
-            level = root.replace(self.root, "").count(os.sep)
-            if level >= self.depth:
-                del dirs[:]
+    def _scan(self, dir_path: str, level: int = 0):
+        """Recursive os.scandir walk yielding ("dir"|"file", DirEntry, level).
+
+        DirEntry caches the stat result from the directory read itself, so
+        files need no extra stat syscall or Path object downstream.
+        """
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.error(f"Scan error {dir_path}: {e}")
+            return
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in IGNORE_PATHS:
+                        continue
+                    if not self.include_tests and ("test" in entry.name.lower() or "spec" in entry.name.lower()):
+                        continue
+                    subdirs.append(entry)
+                elif entry.is_file():
+                    yield "file", entry, level
+            except OSError:
                 continue
-            indent = "│   " * level
-            lines.append(f"{indent}📂 {os.path.basename(root)}/")
-            sub = "│   " * (level + 1)
-            for f in sorted(files):
-                ext = Path(f).suffix
-                if ext in SUPPORTED_EXTENSIONS or f in SPECIAL_FILENAMES:
-                    lines.append(f"{sub}📄 {f}")
-        return "\n".join(lines)
-
-    def scan_and_read(self) -> Tuple[str, List[FileNodeInfo], Dict]:
+        for entry in subdirs:
+            yield "dir", entry, level + 1
+            yield from self._scan(entry.path, level + 1)
+
+    async def scan_and_read(self) -> Tuple[str, List[FileNodeInfo], Dict]:
+        # One stat-only walk decides whether the whole scan can be skipped
+        sig = await asyncio.to_thread(
+            scan_cache.tree_signature, self.root, IGNORE_PATHS,
+            # bump SCAN_SCHEMA_VERSION whenever the shape of the cached
+            # (payload, files, summary) tuple changes, so stale pickles miss
+            (self.max_files, self.include_tests, self.depth, SCAN_SCHEMA_VERSION),
+        )
+        cached = scan_cache.load(sig)
+        if cached is not None:
+            logger.info(f"Scan cache hit for {self.root}")
+            return cached
+        result = await self._scan_and_read_uncached()
+        scan_cache.store(sig, result)
+        return result
+
+    async def _scan_and_read_uncached(self) -> Tuple[str, List[FileNodeInfo], Dict]:
         code_parts = []
         meta_list: List[FileNodeInfo] = []
+        # Parallel column of scores — summary aggregation works on this flat
+        # list instead of re-walking Pydantic objects attribute by attribute
+        cx_scores: List[int] = []
         lang_stats: Dict[str, int] = defaultdict(int)
         total_lines = total_bytes = 0
+        tree_lines = [f"📂 {os.path.basename(self.root)}/"]
+        candidates = []
+        seen_files = 0
+        # Once the read cap is hit, keep walking only long enough to give the
+        # tree some context past it (4x), then stop — no point enumerating a
+        # 50k-file repo for a 120-file analysis.
+        walk_budget = self.max_files * 4
+
+        # Single traversal builds the tree string and collects read candidates.
+        for kind, entry, level in self._scan(self.root):
+            if kind == "dir":
+                if level < self.depth:
+                    tree_lines.append("│   " * level + f"📂 {entry.name}/")
+                continue
 
-        for root, dirs, files in os.walk(self.root):
-            dirs[:] = sorted([d for d in dirs if d not in IGNORE_PATHS])
-            if not self.include_tests:
-                dirs[:] = [d for d in dirs if "test" not in d.lower() and "spec" not in d.lower()]
-
-            for fn in sorted(files):
-                if len(meta_list) >= self.max_files:
-                    break
-                fp = Path(root) / fn
-                ext = fp.suffix.lower()
-                fname = fp.name
-
-                # Check if file is supported by extension OR by special filename
-                is_special = fname in SPECIAL_FILENAMES or fname.lower() in {k.lower() for k in SPECIAL_FILENAMES}
-                if ext not in SUPPORTED_EXTENSIONS and not is_special:
-                    continue
+            fname = entry.name
+            ext = os.path.splitext(fname)[1].lower()
 
-                try:
-                    rel = os.path.relpath(fp, self.root)
-                    st = fp.stat()
-                    # Skip very large files (>200KB)
-                    if st.st_size > 200_000:
-                        continue
-                    content = open(fp, "r", encoding="utf-8", errors="ignore").read()
-                    lns = content.split("\n")
+            # Check if file is supported by extension OR by special filename
+            is_special = fname in SPECIAL_FILENAMES or fname.lower() in SPECIAL_FILENAMES_LOWER
+            if ext not in SUPPORTED_EXTENSIONS and not is_special:
+                continue
+            seen_files += 1
+            if seen_files > walk_budget and len(candidates) >= self.max_files:
+                tree_lines.append("│   ...(tree truncated)...")
+                break
+            if level < self.depth:
+                tree_lines.append("│   " * (level + 1) + f"📄 {fname}")
+            if len(candidates) >= self.max_files:
+                continue
 
-                    # Resolve language info
-                    if is_special and ext not in SUPPORTED_EXTENSIONS:
-                        info = SPECIAL_FILENAMES.get(fname, {"name": "Config", "color": "#888"})
-                    else:
-                        info = LANGUAGE_MAP.get(ext, {"name": "Unknown", "color": "#888"})
-                    imports = self._extract_imports(content, ext)
-                    cx = ComplexityAnalyzer.score(content, ext)
-                    lang_stats[info["name"]] += len(lns)
-                    total_lines += len(lns)
-                    total_bytes += st.st_size
-
-                    meta_list.append(FileNodeInfo(
-                        path=str(fp), relative_path=rel, size_bytes=st.st_size,
-                        line_count=len(lns), extension=ext, language=info["name"],
-                        language_color=info["color"],
-                        last_modified=datetime.fromtimestamp(st.st_mtime).isoformat(),
-                        imports=imports, complexity_score=cx,
-                        has_tests="test" in rel.lower(),
+            try:
+                st = entry.stat()
+                # Skip very large files (>200KB)
+                if st.st_size > 200_000:
+                    continue
+                rel = os.path.relpath(entry.path, self.root)
+                cached = self._analysis_cache.get(entry.path)
+                if cached and (cached["mtime"] != st.st_mtime or cached["size"] != st.st_size):
+                    cached = None
+                candidates.append((entry.path, rel, fname, ext, is_special, st, cached))
+            except OSError as e:
+                logger.error(f"Stat error {fname}: {e}")
+
+        jobs = [(path, ext, cached is None) for path, _, _, ext, _, _, cached in candidates]
+
+        if len(jobs) > self.PROCESS_POOL_MIN_FILES:
+            # Big scans: regex + scoring are pure-Python and GIL-bound, so
+            # ship them to worker processes for real multi-core parallelism.
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+                results = await asyncio.to_thread(
+                    lambda: list(pool.map(
+                        _read_and_analyze,
+                        [j[0] for j in jobs], [j[1] for j in jobs], [j[2] for j in jobs],
+                        chunksize=4,
                     ))
+                )
+        else:
+            # Small scans: thread pool only — IPC would cost more than it saves.
+            # The semaphore keeps disk queue depth bounded.
+            sem = asyncio.Semaphore(self.READ_CONCURRENCY)
+
+            async def _read_one(job):
+                async with sem:
+                    return await asyncio.to_thread(_read_and_analyze, *job)
 
-                    show = content if len(lns) <= 200 else "\n".join(lns[:120] + ["...(truncated)..."] + lns[-50:])
-                    code_parts.append(f"\n--- FILE: {rel} | {info['name']} | {len(lns)} lines | complexity={cx} ---\n{show}\n")
-                except Exception as e:
-                    logger.error(f"Read error {fn}: {e}")
+            results = await asyncio.gather(*(_read_one(j) for j in jobs))
 
-        # Dependency links
+        for (path, rel, fname, ext, is_special, st, cached), res in zip(candidates, results):
+            if isinstance(res, BaseException):
+                logger.error(f"Read error {fname}: {res}")
+                continue
+            content, n_lines, imports, cx = res
+            if cached:
+                imports, cx = cached["imports"], cached["complexity"]
+            else:
+                self._analysis_cache[path] = {
+                    "mtime": st.st_mtime, "size": st.st_size,
+                    "lines": n_lines, "imports": imports, "complexity": cx,
+                }
+                self._cache_dirty = True
+
+            # Resolve language info
+            if is_special and ext not in SUPPORTED_EXTENSIONS:
+                info = SPECIAL_FILENAMES.get(fname, {"name": "Config", "color": "#888"})
+            else:
+                info = LANGUAGE_MAP.get(ext, {"name": "Unknown", "color": "#888"})
+
+            # model_construct: every field is produced right here with the
+            # correct type, so per-file validation is pure overhead
+            meta_list.append(FileNodeInfo.model_construct(
+                path=path, relative_path=rel, size_bytes=st.st_size,
+                line_count=n_lines, extension=ext, language=info["name"],
+                language_color=info["color"],
+                last_modified=st.st_mtime,
+                imports=imports, complexity_score=cx,
+                has_tests="test" in rel.lower(),
+            ))
+            cx_scores.append(cx)
+            if n_lines <= 200:
+                show = content
+            else:
+                lns = content.split("\n")
+                show = "\n".join(lns[:120] + ["...(truncated)..."] + lns[-50:])
+            # Header and body stay separate so truncation can slice the body
+            # without ever re-copying it into a formatted string
+            code_parts.append((f"\n--- FILE: {rel} | {info['name']} | {n_lines} lines | complexity={cx} ---\n", show))
+            lang_stats[info["name"]] += n_lines
+            total_lines += n_lines
+            total_bytes += st.st_size
+
+        self._flush_analysis_cache()
+
+        # Dependency links + connection counts in one pass. Links carry the
+        # positional index of both endpoints so consumers that name nodes by
+        # position (the Mermaid export) never re-look paths up.
         dep_links = []
-        all_rels = {m.relative_path: m for m in meta_list}
-        for m in meta_list:
+        conn: Dict[str, int] = defaultdict(int)
+        suffix_index = self._build_suffix_index(m.relative_path for m in meta_list)
+        rel_index = {m.relative_path: i for i, m in enumerate(meta_list)}
+        for i, m in enumerate(meta_list):
             for imp in m.imports:
-                target = self._resolve_import(imp, all_rels)
+                target = self._resolve_import(imp, suffix_index)
                 if target and target != m.relative_path:
-                    dep_links.append({"source": m.relative_path, "target": target, "type": "imports", "raw": imp})
-
-        # Hotspots
-        by_cx = sorted(meta_list, key=lambda f: f.complexity_score, reverse=True)
-        hotspots = [{"file": f.relative_path, "complexity": f.complexity_score, "lines": f.line_count, "language": f.language} for f in by_cx[:5]]
-
-        # Most connected
-        conn = defaultdict(int)
-        for l in dep_links:
-            conn[l["source"]] += 1
-            conn[l["target"]] += 1
-        most_conn = [{"file": f, "connections": c} for f, c in sorted(conn.items(), key=lambda x: x[1], reverse=True)[:5]]
+                    dep_links.append({"source": m.relative_path, "target": target,
+                                      "source_idx": i, "target_idx": rel_index[target],
+                                      "type": "imports", "raw": imp})
+                    conn[m.relative_path] += 1
+                    conn[target] += 1
+
+        # Top-5 selections via heap instead of sorting the full lists; the
+        # heap ranks plain ints from the score column, not object attributes
+        top_idx = heapq.nlargest(5, range(len(meta_list)), key=cx_scores.__getitem__)
+        hotspots = [{"file": meta_list[i].relative_path, "complexity": cx_scores[i],
+                     "lines": meta_list[i].line_count, "language": meta_list[i].language}
+                    for i in top_idx]
+        most_conn = [{"file": f, "connections": c} for f, c in heapq.nlargest(5, conn.items(), key=lambda x: x[1])]
 
         summary = {
             "name": os.path.basename(self.root),
             "total_files": len(meta_list), "total_lines": total_lines, "total_bytes": total_bytes,
             "languages": dict(lang_stats), "dependency_links": dep_links,
             "hotspots": hotspots, "most_connected": most_conn,
-            "avg_complexity": round(sum(m.complexity_score for m in meta_list) / max(len(meta_list), 1), 1),
+            "avg_complexity": round(sum(cx_scores) / max(len(cx_scores), 1), 1),
         }
 
-        tree = self.generate_tree()
-        payload = f"REPOSITORY: {summary['name']}\nLANGUAGES: {json.dumps(summary['languages'])}\n"
-        payload += f"FILES: {summary['total_files']} | LINES: {total_lines}\nAVG COMPLEXITY: {summary['avg_complexity']}/100\n\n"
-        payload += f"STRUCTURE:\n{tree}\n\nIMPORT DEPS:\n{json.dumps(dep_links, indent=2)}\n\n"
+        tree = "\n".join(tree_lines)
+        # orjson serializes ~an order of magnitude faster than stdlib json,
+        # and the model doesn't need indent=2 pretty-printing
+        header = (
+            f"REPOSITORY: {summary['name']}\nLANGUAGES: {orjson.dumps(summary['languages']).decode()}\n"
+            f"FILES: {summary['total_files']} | LINES: {total_lines}\nAVG COMPLEXITY: {summary['avg_complexity']}/100\n\n"
+            f"STRUCTURE:\n{tree}\n\nIMPORT DEPS:\n{orjson.dumps(dep_links).decode()}\n\n"
+        )
 
         # Smart truncation: keep total payload under ~80K tokens (~320K chars)
         # Priority: high complexity files get more space, low complexity get less
         MAX_PAYLOAD_CHARS = 300_000
-        header_len = len(payload)
-        remaining = MAX_PAYLOAD_CHARS - header_len
+        remaining = MAX_PAYLOAD_CHARS - len(header)
 
         if remaining <= 0:
             # Even header is too large, trim tree
-            payload = f"REPOSITORY: {summary['name']}\nFILES: {summary['total_files']}\n\n"
-            remaining = MAX_PAYLOAD_CHARS - len(payload)
+            header = f"REPOSITORY: {summary['name']}\nFILES: {summary['total_files']}\n\n"
+            remaining = MAX_PAYLOAD_CHARS - len(header)
 
         # Sort code parts by importance: higher complexity = more important
         sorted_files = sorted(
@@ -467,50 +769,57 @@ class RepositoryProcessor:
             reverse=True
         )
 
-        # First pass: include all files but truncate each proportionally
-        total_code = sum(len(p) for _, p in sorted_files)
-        final_parts = []
+        # First pass: include all files but truncate each proportionally.
+        # A single StringIO writer with a running budget keeps assembly O(N)
+        # and makes the old post-hoc slice of the whole payload unnecessary.
+        total_code = sum(len(h) + len(b) + 1 for _, (h, b) in sorted_files)
+        buf = io.StringIO()
+        buf.write(header)
 
         if total_code <= remaining:
             # Everything fits
-            final_parts = [p for _, p in sorted_files]
+            for _, (h, b) in sorted_files:
+                buf.write(h)
+                buf.write(b)
+                buf.write("\n")
         else:
             # Budget per file based on importance rank
             used = 0
-            for i, (meta, part) in enumerate(sorted_files):
+            for i, (meta, (h, b)) in enumerate(sorted_files):
                 # Top files get more budget, bottom files get summaries only
                 if i < 5:
                     # Important files: up to 60K chars each, or whatever's left
-                    budget = min(len(part), 60_000, remaining - used)
+                    budget = min(len(h) + len(b), 60_000, remaining - used)
                 elif i < 15:
                     # Medium files: up to 10K chars each
-                    budget = min(len(part), 10_000, remaining - used)
+                    budget = min(len(h) + len(b), 10_000, remaining - used)
                 else:
                     # Lower priority: just first 80 lines (~3K chars)
-                    lines = part.split("\n")
-                    trimmed = "\n".join(lines[:80])
+                    lines = b.split("\n")
                     if len(lines) > 80:
-                        trimmed += "\n...(truncated to first 80 lines)...\n"
-                    budget = min(len(trimmed), 3_000, remaining - used)
-                    part = trimmed
-
-                if budget <= 0:
-                    # Add just the header line so Nemotron knows the file exists
-                    header_line = part.split("\n")[0] if part else f"--- FILE: {meta.relative_path} (content omitted - token limit) ---"
-                    final_parts.append(header_line + "\n")
-                    used += len(header_line) + 1
+                        b = "\n".join(lines[:80]) + "\n...(truncated to first 80 lines)..."
+                    budget = min(len(h) + len(b), 3_000, remaining - used)
+
+                if budget <= len(h):
+                    # Just the header so Nemotron knows the file exists —
+                    # unless even that would blow the budget
+                    if used + len(h) > remaining:
+                        break
+                    buf.write(h)
+                    used += len(h)
                 else:
-                    truncated = part[:budget]
-                    if len(part) > budget:
-                        truncated += "\n...(truncated)...\n"
-                    final_parts.append(truncated)
-                    used += len(truncated)
-
-        payload += "".join(final_parts)
+                    piece = b[: budget - len(h)]
+                    buf.write(h)
+                    buf.write(piece)
+                    used += len(h) + len(piece)
+                    if len(b) > len(piece):
+                        buf.write("\n...(truncated)...\n")
+                        used += 19
+                    else:
+                        buf.write("\n")
+                        used += 1
 
-        # Final safety check
-        if len(payload) > MAX_PAYLOAD_CHARS:
-            payload = payload[:MAX_PAYLOAD_CHARS] + "\n\n...(payload truncated to fit context window)..."
+        payload = buf.getvalue()
 
         logger.info(f"Payload size: {len(payload)} chars (~{len(payload)//4} tokens)")
 
@@ -518,9 +827,92 @@ class RepositoryProcessor:
 
 
 
+class StreamingGraphParser:
+    """Incremental extractor for the model's `{"nodes": [...], "links": [...]}` reply.
+
+    The frontend otherwise has to buffer every content delta and parse the
+    whole document once the stream ends. feed() consumes deltas as they
+    arrive and returns each array element the moment its closing brace
+    shows up, so completed nodes/links can be pushed as their own SSE
+    events mid-generation. A small depth/in-string scanner is all the
+    "streaming JSON parser" this fixed two-array schema needs.
+    """
+
+    SECTIONS = {"nodes": "node", "links": "link"}
+
+    def __init__(self):
+        self._in_string = False
+        self._escape = False
+        self._depth = 0
+        self._str_buf: List[str] = []
+        self._pending_key: Optional[str] = None
+        self._section: Optional[str] = None
+        self._section_depth = 0
+        self._obj: Optional[List[str]] = None
+        self._obj_depth = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Dict]]:
+        """Consume a content delta; return (event_type, obj) for each element closed."""
+        out: List[Tuple[str, Dict]] = []
+        for ch in text:
+            if self._obj is not None:
+                self._obj.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._pending_key = "".join(self._str_buf)
+                else:
+                    self._str_buf.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._str_buf = []
+                continue
+            if ch in " \t\r\n:":
+                continue  # ':' keeps a just-closed string eligible as a key
+            if ch == "[":
+                self._depth += 1
+                if self._section is None and self._pending_key in self.SECTIONS and self._depth == 2:
+                    self._section = self.SECTIONS[self._pending_key]
+                    self._section_depth = self._depth
+            elif ch == "{":
+                self._depth += 1
+                if self._section and self._obj is None and self._depth == self._section_depth + 1:
+                    self._obj = [ch]
+                    self._obj_depth = self._depth
+            elif ch == "}":
+                self._depth -= 1
+                if self._obj is not None and self._depth < self._obj_depth:
+                    try:
+                        out.append((self._section, orjson.loads("".join(self._obj))))
+                    except orjson.JSONDecodeError:
+                        pass  # malformed element — the client's full parse will cope
+                    self._obj = None
+            elif ch == "]":
+                self._depth -= 1
+                if self._section and self._obj is None and self._depth < self._section_depth:
+                    self._section = None
+            self._pending_key = None
+        return out
+
+
+@lru_cache(maxsize=8)
+def _client_for(api_key: str) -> AsyncOpenAI:
+    """One AsyncOpenAI client per key, shared across requests.
+
+    Each client owns an httpx pool; rebuilding it per request threw away
+    warm TLS connections to the NIM endpoint on every call.
+    """
+    return AsyncOpenAI(base_url=NVIDIA_BASE_URL, api_key=api_key)
+
+
 class NemotronOrchestrator:
     def __init__(self, api_key: str):
-        self.client = OpenAI(base_url=NVIDIA_BASE_URL, api_key=api_key)
+        self.client = _client_for(api_key)
 
     SYS_ARCH = """You are the Nemotron Mamba-Hybrid Architect analyzing a codebase to generate a 3D architectural map.
 
@@ -710,53 +1102,87 @@ If no GPU/CUDA code is found, still analyze if the codebase COULD benefit from G
 
 Return raw JSON after reasoning. No markdown fences."""
 
-    async def _stream_generic(self, system_prompt: str, payload: str, event_type: str = "content"):
-        """Generic streaming method for all analysis types."""
+    # Per-message cap when splitting the repository payload across user
+    # messages — one giant blob forces a full re-copy during request
+    # assembly and gives the upstream tokenizer no natural boundaries.
+    MESSAGE_CHUNK_CHARS = 32_768
+
+    @staticmethod
+    def _iter_message_chunks(parts: Sequence[str], max_chars: int = MESSAGE_CHUNK_CHARS):
+        """Pack payload parts into message-sized chunks without re-joining everything."""
+        buf: List[str] = []
+        size = 0
+        for part in parts:
+            while part:
+                take = part if size + len(part) <= max_chars else part[: max_chars - size]
+                buf.append(take)
+                size += len(take)
+                part = part[len(take):]
+                if size >= max_chars:
+                    yield "".join(buf)
+                    buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+
+    async def _stream_generic(self, system_prompt: str, payload, event_type: str = "content"):
+        """Generic streaming method for all analysis types.
+
+        `payload` is either a single string or a sequence of parts; parts are
+        sent as multiple bounded user messages so we never concatenate the
+        whole repository into one string just to build the request.
+        """
         try:
-            stream = self.client.chat.completions.create(
+            parts = (payload,) if isinstance(payload, str) else payload
+            messages = [{"role": "system", "content": system_prompt}]
+            messages.extend({"role": "user", "content": chunk}
+                            for chunk in self._iter_message_chunks(parts))
+            stream = await self.client.chat.completions.create(
                 model=NVIDIA_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": payload},
-                ],
+                messages=messages,
                 temperature=0.35, top_p=0.9, max_tokens=8192, stream=True,
             )
-            for chunk in stream:
+            async for chunk in stream:
                 d = chunk.choices[0].delta if chunk.choices else None
                 if not d:
                     continue
                 r = getattr(d, "reasoning_content", None)
                 if r:
-                    yield f"data: {json.dumps({'type':'thought','content':r})}\n\n"
+                    yield orjson.dumps({'type': 'thought', 'content': r}).decode()
                 if d.content:
-                    yield f"data: {json.dumps({'type': event_type, 'content': d.content})}\n\n"
-                await asyncio.sleep(0.003)
-            yield f"data: {json.dumps({'type':'done'})}\n\n"
+                    yield orjson.dumps({'type': event_type, 'content': d.content}).decode()
+            yield orjson.dumps({'type': 'done'}).decode()
         except Exception as e:
             logger.error(f"NIM Error: {e}")
-            yield f"data: {json.dumps({'type':'error','content':str(e)})}\n\n"
+            yield orjson.dumps({'type': 'error', 'content': str(e)}).decode()
 
-    async def stream_arch(self, payload: str):
-        async for event in self._stream_generic(self.SYS_ARCH, f"Analyze:\n\n{payload}", "content"):
+    async def stream_arch(self, payload):
+        async for event in self._stream_generic(self.SYS_ARCH, self._with_prefix("Analyze:\n\n", payload), "content"):
             yield event
 
-    async def stream_query(self, payload: str, question: str):
-        prompt = f"CODEBASE:\n{payload}\n\nQ: {question}"
+    async def stream_query(self, payload, question: str):
+        prompt = (*self._with_prefix("CODEBASE:\n", payload), f"\n\nQ: {question}")
         async for event in self._stream_generic(self.SYS_QUERY, prompt, "answer"):
             yield event
 
-    async def stream_security(self, payload: str):
-        async for event in self._stream_generic(self.SYS_SECURITY, f"Audit this codebase:\n\n{payload}", "content"):
+    async def stream_security(self, payload):
+        async for event in self._stream_generic(self.SYS_SECURITY, self._with_prefix("Audit this codebase:\n\n", payload), "content"):
             yield event
 
-    async def stream_onboarding(self, payload: str):
-        async for event in self._stream_generic(self.SYS_ONBOARDING, f"Create onboarding guide:\n\n{payload}", "content"):
+    async def stream_onboarding(self, payload):
+        async for event in self._stream_generic(self.SYS_ONBOARDING, self._with_prefix("Create onboarding guide:\n\n", payload), "content"):
             yield event
 
-    async def stream_cuda(self, payload: str):
-        async for event in self._stream_generic(self.SYS_CUDA, f"Analyze GPU/CUDA usage:\n\n{payload}", "content"):
+    async def stream_cuda(self, payload):
+        async for event in self._stream_generic(self.SYS_CUDA, self._with_prefix("Analyze GPU/CUDA usage:\n\n", payload), "content"):
             yield event
 
+    @staticmethod
+    def _with_prefix(prefix: str, payload) -> Tuple[str, ...]:
+        """Prepend a prompt prefix without copying the payload into a new string."""
+        if isinstance(payload, str):
+            return (prefix, payload)
+        return (prefix, *payload)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # FASTAPI
@@ -765,6 +1191,22 @@ app = FastAPI(title="Mamba-Graph Pro", version="3.1.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 
+def sse_response(gen) -> StreamingResponse:
+    """Wrap an async generator of JSON strings as an SSE response.
+
+    sse-starlette does the framing, keep-alive pings and proxy-buffering
+    headers; without it we fall back to hand-built data: frames.
+    """
+    if EventSourceResponse is not None:
+        return EventSourceResponse(gen)
+
+    async def _frame():
+        async for data in gen:
+            yield f"data: {data}\n\n"
+
+    return StreamingResponse(_frame(), media_type="text/event-stream")
+
+
 @app.get("/")
 async def health():
     return {"status": "online", "engine": NVIDIA_MODEL, "version": "3.1.0", "has_api_key": APIKeyManager.has_key()}
@@ -786,8 +1228,8 @@ async def preview(req: AnalyzeRequest):
     try:
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-        _, files, summary = proc.scan_and_read()
-        return {"summary": summary, "files": [f.dict() for f in files]}
+        _, files, summary = await proc.scan_and_read()
+        return {"summary": summary, "files": FILE_LIST_ADAPTER.dump_python(files)}
     except HTTPException:
         raise
     except Exception as e:
@@ -800,20 +1242,25 @@ async def analyze(req: AnalyzeRequest):
         api_key = APIKeyManager.get_key(req.nvidia_api_key)
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-        payload, files, summary = proc.scan_and_read()
+        payload, files, summary = await proc.scan_and_read()
         if not files:
             raise HTTPException(status_code=400, detail="No source files found.")
 
-        # Build explicit file list for Nemotron to reference
-        file_list = []
-        for f in files:
-            file_list.append(f"{f.relative_path} ({f.language}, {f.line_count} lines, complexity={f.complexity_score})")
-
-        file_list_str = "\n".join([f"  {i+1}. {fl}" for i, fl in enumerate(file_list)])
-        dep_list_str = "\n".join([f"  - {d['source']} → {d['target']} (imports {d.get('raw','')})" for d in summary.get("dependency_links", [])])
+        # Explicit file list for Nemotron to reference — formatted once per
+        # file straight into join, no intermediate list of strings
+        file_list_str = "\n".join(
+            f"  {i}. {f.relative_path} ({f.language}, {f.line_count} lines, complexity={f.complexity_score})"
+            for i, f in enumerate(files, 1)
+        )
+        dep_list_str = "\n".join(
+            f"  - {d['source']} → {d['target']} (imports {d.get('raw', '')})"
+            for d in summary.get("dependency_links", [])
+        )
 
-        # Build focused payload with numbered file list
-        focused_payload = f"""REPOSITORY: {summary['name']}
+        # Focused payload: numbered file list as a TOC part, source as its
+        # own part — the orchestrator sends these as bounded chunks, so the
+        # repo source is never copied into yet another composite string
+        toc = f"""REPOSITORY: {summary['name']}
 TOTAL FILES: {len(files)} | TOTAL LINES: {summary['total_lines']}
 
 ALL {len(files)} FILES (numbered):
@@ -822,18 +1269,27 @@ ALL {len(files)} FILES (numbered):
 IMPORT DEPENDENCIES FOUND:
 {dep_list_str if dep_list_str else '  (none detected statically)'}
 
-{payload}"""
+"""
+        focused_payload = (toc, payload)
 
         orch = NemotronOrchestrator(api_key)
 
         async def gen():
-            yield f"data: {json.dumps({'type': 'metadata', 'content': summary})}\n\n"
+            yield orjson.dumps({'type': 'metadata', 'content': summary}).decode()
             # Also send file list so frontend can show it
-            yield f"data: {json.dumps({'type': 'file_list', 'content': [f.dict() for f in files]})}\n\n"
+            yield orjson.dumps({'type': 'file_list', 'content': FILE_LIST_ADAPTER.dump_python(files)}).decode()
+            # Tap the content deltas so each completed node/link goes out as
+            # its own event mid-generation; raw content events still flow for
+            # clients that parse the full document at the end.
+            parser = StreamingGraphParser()
             async for ev in orch.stream_arch(focused_payload):
                 yield ev
+                evt = orjson.loads(ev)
+                if evt.get('type') == 'content':
+                    for kind, item in parser.feed(evt['content']):
+                        yield orjson.dumps({'type': kind, 'content': item}).decode()
 
-        return StreamingResponse(gen(), media_type="text/event-stream")
+        return sse_response(gen())
     except HTTPException:
         raise
     except Exception as e:
@@ -847,11 +1303,11 @@ async def query(req: QueryRequest):
         api_key = APIKeyManager.get_key(req.nvidia_api_key)
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files)
-        payload, files, _ = proc.scan_and_read()
+        payload, files, _ = await proc.scan_and_read()
         if not files:
             raise HTTPException(status_code=400, detail="No source files found.")
         orch = NemotronOrchestrator(api_key)
-        return StreamingResponse(orch.stream_query(payload, req.question), media_type="text/event-stream")
+        return sse_response(orch.stream_query(payload, req.question))
     except HTTPException:
         raise
     except Exception as e:
@@ -862,25 +1318,41 @@ async def query(req: QueryRequest):
 async def mermaid(req: AnalyzeRequest):
     path = RepoResolver.resolve(req.directory_path)
     proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-    _, files, summary = proc.scan_and_read()
-    lines = ["graph TD"]
-    ids = {}
+    _, files, summary = await proc.scan_and_read()
+    links = summary["dependency_links"]
+    # Node names are just positions, and every link already carries its
+    # endpoint indices — no path-string hashing, and the list is pre-sized
+    # so append never reallocates
+    lines = [None] * (1 + len(files) + len(links))
+    lines[0] = "graph TD"
     for i, f in enumerate(files):
-        ids[f.relative_path] = f"N{i}"
-        lines.append(f'    N{i}["{f.relative_path}"]')
-    for link in summary["dependency_links"]:
-        s, t = ids.get(link["source"]), ids.get(link["target"])
-        if s and t:
-            lines.append(f"    {s} -->|imports| {t}")
+        lines[i + 1] = f'    N{i}["{f.relative_path}"]'
+    base = 1 + len(files)
+    for j, link in enumerate(links):
+        lines[base + j] = f"    N{link['source_idx']} -->|imports| N{link['target_idx']}"
     return {"mermaid": "\n".join(lines), "summary": summary}
 
 
+# Keep background tasks referenced until done — the loop only holds weak refs
+_background_tasks: set = set()
+
+
 @app.delete("/api/v1/cache")
 async def clear_cache():
     count = sum(1 for d in CLONE_DIR.iterdir() if d.is_dir())
-    shutil.rmtree(CLONE_DIR, ignore_errors=True)
-    CLONE_DIR.mkdir(exist_ok=True)
-    return {"cleared": count}
+    RepoResolver.resolve.cache_clear()
+    scan_cache.clear()
+
+    async def _rm_clones():
+        # rmtree on a big clone dir can take seconds; do it off-loop so the
+        # DELETE returns immediately instead of stalling every other request
+        await asyncio.to_thread(shutil.rmtree, CLONE_DIR, ignore_errors=True)
+        CLONE_DIR.mkdir(exist_ok=True)
+
+    task = asyncio.create_task(_rm_clones())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {"status": "clearing", "cleared": count}
 
 
 # ─── Security Scan ───
@@ -892,17 +1364,17 @@ async def security_scan(req: AnalyzeRequest):
         api_key = APIKeyManager.get_key(req.nvidia_api_key)
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-        payload, files, summary = proc.scan_and_read()
+        payload, files, summary = await proc.scan_and_read()
         if not files:
             raise HTTPException(status_code=400, detail="No source files found.")
         orch = NemotronOrchestrator(api_key)
 
         async def gen():
-            yield f"data: {json.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name']}})}\n\n"
+            yield orjson.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name']}}).decode()
             async for ev in orch.stream_security(payload):
                 yield ev
 
-        return StreamingResponse(gen(), media_type="text/event-stream")
+        return sse_response(gen())
     except HTTPException:
         raise
     except Exception as e:
@@ -918,17 +1390,17 @@ async def onboarding_guide(req: AnalyzeRequest):
         api_key = APIKeyManager.get_key(req.nvidia_api_key)
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-        payload, files, summary = proc.scan_and_read()
+        payload, files, summary = await proc.scan_and_read()
         if not files:
             raise HTTPException(status_code=400, detail="No source files found.")
         orch = NemotronOrchestrator(api_key)
 
         async def gen():
-            yield f"data: {json.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name']}})}\n\n"
+            yield orjson.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name']}}).decode()
             async for ev in orch.stream_onboarding(payload):
                 yield ev
 
-        return StreamingResponse(gen(), media_type="text/event-stream")
+        return sse_response(gen())
     except HTTPException:
         raise
     except Exception as e:
@@ -944,17 +1416,17 @@ async def cuda_analysis(req: AnalyzeRequest):
         api_key = APIKeyManager.get_key(req.nvidia_api_key)
         path = RepoResolver.resolve(req.directory_path)
         proc = RepositoryProcessor(path, req.max_files, req.include_tests, req.depth)
-        payload, files, summary = proc.scan_and_read()
+        payload, files, summary = await proc.scan_and_read()
         if not files:
             raise HTTPException(status_code=400, detail="No source files found.")
         orch = NemotronOrchestrator(api_key)
 
         async def gen():
-            yield f"data: {json.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name'], 'languages': summary['languages']}})}\n\n"
+            yield orjson.dumps({'type': 'metadata', 'content': {'total_files': len(files), 'name': summary['name'], 'languages': summary['languages']}}).decode()
             async for ev in orch.stream_cuda(payload):
                 yield ev
 
-        return StreamingResponse(gen(), media_type="text/event-stream")
+        return sse_response(gen())
     except HTTPException:
         raise
     except Exception as e:
@@ -963,4 +1435,8 @@ async def cuda_analysis(req: AnalyzeRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # uvloop + httptools (both ship with uvicorn[standard]) instead of the
+    # default asyncio loop and h11 parser — SSE streaming pushes thousands
+    # of tiny writes per response, where event-loop overhead dominates
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                loop="uvloop", http="httptools")
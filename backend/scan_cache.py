@@ -0,0 +1,89 @@
+"""Memory + disk cache for whole repository-scan results.
+
+Every endpoint re-runs the same scan_and_read() over the same directory;
+this caches the full (payload, files, summary) result keyed by a cheap
+signature of the tree (relpath + mtime + size of every file) plus the
+scan parameters, so repeat calls in a session skip the scan entirely.
+"""
+import os
+import pickle
+import hashlib
+import tempfile
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+SCAN_CACHE_DIR = Path(tempfile.gettempdir()) / "mamba-graph-clones" / ".scan_cache"
+
+_MEM: "OrderedDict[str, Any]" = OrderedDict()
+_MEM_MAX = 32
+
+
+def tree_signature(root: str, ignore_dirs: Iterable[str], params: Tuple) -> str:
+    """Hash (relpath, mtime_ns, size) for every file plus the scan params.
+
+    One stat-only walk is far cheaper than re-reading and re-scoring the
+    tree, and any touched file changes the signature.
+    """
+    ignore = frozenset(ignore_dirs)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((os.path.abspath(root), params)).encode())
+
+    def _walk(dir_path: str):
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ignore:
+                        _walk(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    h.update(entry.name.encode("utf-8", "ignore"))
+                    h.update(st.st_mtime_ns.to_bytes(12, "little", signed=True))
+                    h.update(st.st_size.to_bytes(8, "little"))
+            except OSError:
+                continue
+
+    _walk(root)
+    return h.hexdigest()
+
+
+def _remember(sig: str, value: Any):
+    _MEM[sig] = value
+    _MEM.move_to_end(sig)
+    while len(_MEM) > _MEM_MAX:
+        _MEM.popitem(last=False)
+
+
+def load(sig: str) -> Optional[Any]:
+    if sig in _MEM:
+        _MEM.move_to_end(sig)
+        return _MEM[sig]
+    try:
+        with open(SCAN_CACHE_DIR / f"{sig}.pkl", "rb") as f:
+            value = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        return None
+    _remember(sig, value)
+    return value
+
+
+def store(sig: str, value: Any):
+    _remember(sig, value)
+    try:
+        SCAN_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=SCAN_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, SCAN_CACHE_DIR / f"{sig}.pkl")
+    except OSError:
+        pass  # cache is best-effort
+
+
+def clear():
+    """Drop the in-memory layer (the disk layer lives under the clone dir)."""
+    _MEM.clear()
@@ -1,5 +1,5 @@
 import requests
-import json
+import orjson
 import os
 import sys
 
@@ -33,7 +33,7 @@ def test_preview():
         summary = data["summary"]
         print(f"  Repo: {summary['name']}")
         print(f"  Files: {summary['total_files']} | Lines: {summary['total_lines']}")
-        print(f"  Languages: {json.dumps(summary['languages'], indent=4)}")
+        print(f"  Languages: {orjson.dumps(summary['languages'], option=orjson.OPT_INDENT_2).decode()}")
         print(f"  Avg Complexity: {summary['avg_complexity']}/100")
         print(f"  Dependencies found: {len(summary['dependency_links'])}")
         print()
@@ -70,8 +70,10 @@ def test_analyze_sse():
                 if not line or not line.startswith("data: "):
                     continue
                 try:
-                    event = json.loads(line[6:])
-                except json.JSONDecodeError:
+                    # orjson parses each event a few times faster than
+                    # stdlib json — it adds up over a long token stream
+                    event = orjson.loads(line[6:])
+                except orjson.JSONDecodeError:
                     continue
 
                 if event["type"] == "metadata":
@@ -93,7 +95,7 @@ def test_analyze_sse():
             start = json_buffer.find("{")
             end = json_buffer.rfind("}")
             if start != -1 and end != -1:
-                graph = json.loads(json_buffer[start : end + 1])
+                graph = orjson.loads(json_buffer[start : end + 1])
                 print(f"  Nodes: {len(graph.get('nodes', []))}")
                 print(f"  Links: {len(graph.get('links', []))}")
                 if "architecture" in graph:
@@ -101,8 +103,8 @@ def test_analyze_sse():
                     print(f"  Pattern: {arch.get('pattern', 'N/A')}")
                     print(f"  Summary: {arch.get('summary', 'N/A')}")
 
-                with open("graph_output.json", "w") as f:
-                    json.dump(graph, f, indent=2)
+                with open("graph_output.json", "wb") as f:
+                    f.write(orjson.dumps(graph, option=orjson.OPT_INDENT_2))
                 print("  📁 Saved to graph_output.json")
             else:
                 print("  ⚠️  Could not extract JSON from response")